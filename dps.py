@@ -36,24 +36,76 @@
 # No financial advice.
 # ------------------------------------------------------------------------------------------
 
-import subprocess
-import json
 import yaml
 import os
 import sys
 import concurrent.futures
+import contextlib
 import threading
 from datetime import datetime
-import pandas as pd
 import re
 import queue
-from src.output_handler import save_json
-from src.influx_handler import write_to_influxdb  # ✅ Richtig
-from influxdb_client import Point  # ✅ Importiere Point direkt aus influxdb_client
+from src.output_handler import TAG_RE, results_base, unique_results, save_all
+from src.config_handler import YAML_LOADER
 from src.influx_handler import load_config, write_to_influxdb, is_influxdb_reachable
 from src.api_handler import start_api
-from src.output_handler import save_parquet
-from src.output_handler import save_sql
+from src import trading_models
+
+# Header colors of the run blocks in the HTML report, per model variant
+_MODE_COLORS = {
+    "without Markov": "#2196F3",
+    "with Markov 1.Ord": "#4CAF50",
+    "with Markov 2.Ord": "#FF9800",
+    "with Regime-Switching-Modell": "#9C27B0"
+}
+
+# Static head and tail of the HTML report, already UTF-8 encoded for the binary write
+_HTML_PROLOGUE = (
+    "<html><head><meta charset='utf-8'>"
+    "<title>Simulation Runs</title>"
+    "<style>"
+    "body { font-size: 1.18em; font-family: Arial, sans-serif; background: #f7f7fa; }"
+    "h2 { font-size: 1.7em; color: #222; margin-top: 1.2em; }"
+    "div[style*='font-family:monospace'] { font-size: 1.13em; }"
+    "</style></head><body>\n"
+    "<h2>Simulation Runs Overview</h2>\n"
+).encode("utf-8")
+_HTML_EPILOGUE = b"</body></html>\n"
+
+# Patterns used to post-process the simulation output, compiled once
+_ANSI_MAP = {
+    '32': '<span style="color:#0a0;">',     # Green
+    '31': '<span style="color:#c00;">',     # Red
+    '33': '<span style="color:#e6b800;">',  # Yellow
+    '0': '</span>',                         # Reset
+    '1': '<b>',                             # Bold on
+    '22': '</b>',                           # Bold off
+}
+_ANSI_RE = re.compile(r'\x1b\[(32|31|33|0|1|22)m')
+_DASHES = re.compile(r'-{10,}\n')
+
+# Static parts of the highlighted top-4 box, built once
+_TOP4_HEADER = (
+    "Strategy".ljust(90) +
+    "Ø Profit (€)".rjust(14) +
+    "Ø Drawdown (€)".rjust(16) +
+    "Ratio".rjust(12) +
+    "Min (€)".rjust(12) +
+    "Max (€)".rjust(12) +
+    "Min DD (€)".rjust(14) +
+    "Max DD (€)".rjust(14) +
+    "Ø/Trade".rjust(12) +
+    "Profit/MaxDD".rjust(18)
+)
+_TOP4_LINE = "=" * len(_TOP4_HEADER)
+_TOP4_BOX_PREFIX = (
+    '<div style="background:#fffbe6;border:2px solid #fbc02d;'
+    'padding:12px 8px 12px 8px;margin:18px 0 18px 0;'
+    'font-size:0.93em;color:#333;box-shadow:0 2px 8px #fbc02d55;">'
+    '<div style="font-family:monospace;white-space:pre;font-size:0.93em;">'
+    + _TOP4_HEADER + '\n\n' + _TOP4_LINE + '\n\n'
+)
+_TOP4_BOX_SUFFIX = '</div></div>'
 
 def timed_input(prompt, timeout=8, default="n"):
     print(prompt, end="", flush=True)
@@ -75,18 +127,8 @@ def timed_input(prompt, timeout=8, default="n"):
         return default.lower()
     return result.get().lower()
 
-def run_simulation(cmd):
-    # Capture output (stdout)
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return result.returncode, result.stdout
-
 def html_run_header(run_idx, total_runs, hit_rate, mode):
-    color = {
-        "without Markov": "#2196F3",
-        "with Markov 1.Ord": "#4CAF50",
-        "with Markov 2.Ord": "#FF9800",
-        "with Regime-Switching-Modell": "#9C27B0"
-    }.get(mode, "#333")
+    color = _MODE_COLORS.get(mode, "#333")
     html = (
         f'<div style="background:{color};color:#fff;padding:8px 0 8px 10px;'
         f'margin:18px 0 8px 0;font-weight:bold;font-size:1.1em;">'
@@ -97,14 +139,8 @@ def html_run_header(run_idx, total_runs, hit_rate, mode):
 
 def ansi_to_html(text):
     # Simple ANSI to HTML conversion (colors: green/red/yellow)
-    import re
     text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-    text = re.sub(r'\x1b\[32m', '<span style="color:#0a0;">', text)  # Green
-    text = re.sub(r'\x1b\[31m', '<span style="color:#c00;">', text)  # Red
-    text = re.sub(r'\x1b\[33m', '<span style="color:#e6b800;">', text)  # Yellow
-    text = re.sub(r'\x1b\[0m', '</span>', text)  # Reset
-    text = re.sub(r'\x1b\[1m', '<b>', text)      # Bold on
-    text = re.sub(r'\x1b\[22m', '</b>', text)    # Bold off
+    text = _ANSI_RE.sub(lambda m: _ANSI_MAP[m.group(1)], text)  # All escape codes in one pass
     text = text.replace('\n', '<br>\n')          # Line breaks
     return f'<div style="font-family:monospace;font-size:1.13em;white-space:pre;">{text}</div>'
 
@@ -113,34 +149,34 @@ def highlight_top4_section(html):
     Highlights the 'Top 4 strategies compared to ...' section in HTML.
     Preserves the console-style formatting but with smaller text to fit the box.
     Uses monospace font throughout.
+    Returns the input unchanged when the section is not present.
     """
-    import re
-    header = (
-        "Strategy".ljust(90) +
-        "Ø Profit (€)".rjust(14) +
-        "Ø Drawdown (€)".rjust(16) +
-        "Ratio".rjust(12) +
-        "Min (€)".rjust(12) +
-        "Max (€)".rjust(12) +
-        "Min DD (€)".rjust(14) +
-        "Max DD (€)".rjust(14) +
-        "Ø/Trade".rjust(12) +
-        "Profit/MaxDD".rjust(18)
-    )
-    line = "=" * len(header)
-    pattern = r'(Top 4 Strategien im Vergleich zu .+?:<br>)([\s\S]+?)(?=<br><br>|</div>|$)'
-    def repl(match):
-        values = match.group(2).strip('<br>\n').replace('<br>', '\n')
-        values = re.sub(r'-{10,}\n', '', values)
-        return (
-            '<div style="background:#fffbe6;border:2px solid #fbc02d;'
-            'padding:12px 8px 12px 8px;margin:18px 0 18px 0;'
-            'font-size:0.93em;color:#333;box-shadow:0 2px 8px #fbc02d55;">'
-            '<div style="font-family:monospace;white-space:pre;font-size:0.93em;">'
-            + header + '\n\n' + line + '\n\n' + values +
-            '</div></div>'
-        )
-    return re.sub(pattern, repl, html, flags=re.IGNORECASE)
+    # The markers are literal, so locate them with str.find instead of a backtracking regex
+    start = html.find("Top 4 Strategien im Vergleich zu")
+    if start < 0:
+        return html
+    header_end = html.find(":<br>", start)
+    if header_end < 0:
+        return html
+    header_end += len(":<br>")
+    candidates = [html.find(marker, header_end + 1) for marker in ("<br><br>", "</div>")]
+    end = min([pos for pos in candidates if pos >= 0], default=len(html))
+
+    values = html[header_end:end].strip('<br>\n').replace('<br>', '\n')
+    values = _DASHES.sub('', values)
+    return f"{html[:start]}{_TOP4_BOX_PREFIX}{values}{_TOP4_BOX_SUFFIX}{html[end:]}"
+
+def render_run(config):
+    """
+    Runs one simulation in a worker process and converts its output to HTML there,
+    so post-processing overlaps with the runs that are still in progress.
+    Returns the plain converted table and the version with the top-4 box for the report.
+    """
+    # Discard stderr like the former per-run subprocesses did, so warnings don't break the progress line
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        output = trading_models.run(config)
+    table_html = ansi_to_html(output)
+    return table_html, highlight_top4_section(table_html)
 
 def extract_simulation_settings(table_text):
     """Extracts simulation parameters from HTML text and returns them as a dictionary."""
@@ -170,7 +206,7 @@ def main():
     config_path = os.path.join(script_dir, "dps_config.yaml")
     try:
         with open(config_path, "r", encoding="utf-8") as file:
-            args = yaml.safe_load(file)
+            args = yaml.load(file, Loader=YAML_LOADER)
     except FileNotFoundError:
         print(f"Error: '{config_path}' not found.")
         sys.exit(1)
@@ -203,145 +239,117 @@ def main():
     p_win_ll = args.get("p_win_ll", 0.3)
     regimes = args.get("regimes", None)
 
-    # Load InfluxDB configuration from YAML file
-    influx_config = load_config()
-    
-    simulation_cmds = []
-    html_blocks = []
+    simulation_configs = []
     total_runs = 12
     run_counter = 1
 
-    for i, hit_rate in enumerate(hit_rates, start=1):
-        # 1. Without Markov
-        html_blocks.append(html_run_header(run_counter, total_runs, hit_rate, "without Markov"))
-        cmd = [
-            sys.executable,
-            os.path.join(script_dir, "src", "trading_models.py"),
-            "--hit_rate", str(hit_rate),
-            "--avg_win", str(args["avg_win"]),
-            "--avg_loss", str(args["avg_loss"]),
-            "--num_simulations", str(args["num_simulations"]),
-            "--num_trades", str(args["num_trades"]),
-            "--num_mc_shuffles", str(args["num_mc_shuffles"])
-        ]
-        simulation_cmds.append((run_counter, cmd, "without Markov", hit_rate))
-        run_counter += 1
-
-        # 2. Markov 1st order
-        html_blocks.append(html_run_header(run_counter, total_runs, hit_rate, "with Markov 1.Ord"))
-        cmd_markov1 = cmd + [
-            "--use_markov",
-            "--p_win_after_win", str(p_win_after_win),
-            "--p_win_after_loss", str(p_win_after_loss)
-        ]
-        simulation_cmds.append((run_counter, cmd_markov1, "with Markov 1.Ord", hit_rate))
-        run_counter += 1
-
-        # 3. Markov 2nd order
-        html_blocks.append(html_run_header(run_counter, total_runs, hit_rate, "with Markov 2.Ord"))
-        cmd_markov2 = cmd + [
-            "--use_markov2",
-            "--p_win_ww", str(p_win_ww),
-            "--p_win_wl", str(p_win_wl),
-            "--p_win_lw", str(p_win_lw),
-            "--p_win_ll", str(p_win_ll)
-        ]
-        simulation_cmds.append((run_counter, cmd_markov2, "with Markov 2.Ord", hit_rate))
-        run_counter += 1
-
-        # 4. Regime switching
-        html_blocks.append(html_run_header(run_counter, total_runs, hit_rate, "with Regime-Switching-Modell"))
-        cmd_regime = cmd + ["--use_regime"]
-        if regimes:
-            import json as pyjson
-            cmd_regime += ["--regimes", pyjson.dumps(regimes)]
-        simulation_cmds.append((run_counter, cmd_regime, "with Regime-Switching-Modell", hit_rate))
-        run_counter += 1
+    # Settings shared by all runs, converted once
+    base_config = {
+        "avg_win": float(args["avg_win"]),
+        "avg_loss": float(args["avg_loss"]),
+        "num_simulations": int(args["num_simulations"]),
+        "num_trades": int(args["num_trades"]),
+        "num_mc_shuffles": int(args["num_mc_shuffles"]),
+        "use_markov": False,
+        "p_win_after_win": p_win_after_win,
+        "p_win_after_loss": p_win_after_loss,
+        "use_markov2": False,
+        "p_win_ww": p_win_ww,
+        "p_win_wl": p_win_wl,
+        "p_win_lw": p_win_lw,
+        "p_win_ll": p_win_ll,
+        "use_regime": False,
+        "regimes": None,
+        # The runs themselves are spread over the CPUs, so each one simulates serially
+        # (no simulation pool, and Numba pinned to one thread in the run workers)
+        "workers": 1,
+        "seed": None
+    }
+    # Model variants run for every hit rate, in this order
+    variants = [
+        ("without Markov", {}),
+        ("with Markov 1.Ord", {"use_markov": True}),
+        ("with Markov 2.Ord", {"use_markov2": True}),
+        ("with Regime-Switching-Modell", {"use_regime": True, "regimes": regimes})
+    ]
+
+    for hit_rate in hit_rates:
+        for label, extra in variants:
+            config = {**base_config, "hit_rate": hit_rate, **extra}
+            simulation_configs.append((run_counter, config, label, hit_rate))
+            run_counter += 1
 
     # Execute simulations and gather results
-    html_tables = []
     finished = 0
-    total = len(simulation_cmds)
-    lock = threading.Lock()
+    total = len(simulation_configs)
+    # One slot per run, filled in run order as results arrive
+    html_tables = [None] * total
+    report_tables = [None] * total
+
+    # Size the pool to the CPUs this process may actually use (cgroup/affinity limits in containers)
+    try:
+        nproc = len(os.sched_getaffinity(0))
+    except AttributeError:
+        nproc = os.cpu_count() or 4
+    workers = min(total, nproc)
 
+    # Runs execute in worker processes that import trading_models once,
+    # instead of paying interpreter startup and NumPy import per run
     print(f"Starting {total} simulations ...", flush=True)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        future_to_run = {executor.submit(run_simulation, cmd): (idx, label) for idx, cmd, label, _ in simulation_cmds}
+    # Each worker pins Numba to one thread: the runs already occupy every CPU
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=trading_models.pin_numba_threads) as executor:
+        future_to_run = {executor.submit(render_run, config): (idx, label) for idx, config, label, _ in simulation_configs}
         for future in concurrent.futures.as_completed(future_to_run):
             idx, label = future_to_run[future]
             try:
-                returncode, output = future.result()
-                if returncode != 0:
-                    print(f"\nRun {idx} ({label}) exited with error code {returncode}.")
-                    sys.exit(returncode)
-                html_tables.append((idx, ansi_to_html(output)))
+                html_tables[idx - 1], report_tables[idx - 1] = future.result()
             except Exception as exc:
                 print(f"\nRun {idx} ({label}) raised an exception: {exc}")
                 sys.exit(1)
-            with lock:
-                finished += 1
-                print(f"\rProgress: {finished}/{total} completed", end="", flush=True)
+            # as_completed yields in this thread only, so no lock is needed
+            finished += 1
+            print(f"\rProgress: {finished}/{total} completed", end="", flush=True)
     print("\nAll simulations completed.")
 
-    # Sort by run number
-    html_tables.sort(key=lambda x: x[0])
-
     # Create "results" folder if it doesn't exist
     results_dir = os.path.join(script_dir, "results")
     os.makedirs(results_dir, exist_ok=True)
 
-    # Create timestamp for filename
+    # Create timestamp for filename; all output files of this run share the same base path
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    base_path = results_base(results_dir, timestamp)
 
     # Save HTML to results subfolder
-    html_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.html")
-
-    with open(html_output_path, "w", encoding="utf-8") as html_file:
-        html_file.write(
-            "<html><head><meta charset='utf-8'>"
-            "<title>Simulation Runs</title>"
-            "<style>"
-            "body { font-size: 1.18em; font-family: Arial, sans-serif; background: #f7f7fa; }"
-            "h2 { font-size: 1.7em; color: #222; margin-top: 1.2em; }"
-            "div[style*='font-family:monospace'] { font-size: 1.13em; }"
-            "</style></head><body>\n"
-        )
-        html_file.write("<h2>Simulation Runs Overview</h2>\n")
-        for block, (idx, table_html) in zip(html_blocks, html_tables):
-            if "Top 4 Strategien im Vergleich zu" in table_html:
-                table_html = highlight_top4_section(table_html)
-            html_file.write(block + "\n")
-            html_file.write(table_html + "\n")
-        html_file.write("</body></html>\n")
-
-    # Extract simulation settings from HTML content before processing individual strategies
-    # Iterate through all simulations
-    for idx, table_html in html_tables:
-        table_text = re.sub(r"<.*?>", "", table_html)  # Remove HTML tags for clean processing
-
-        # Extract simulation settings using the cleaned text
-        simulation_settings = extract_simulation_settings(table_text)
-
-    # Print all simulation results to console with cleaned HTML
-    for idx, table_html in html_tables:
-        clean_text = re.sub(r"<.*?>", "", table_html)  # Remove HTML tags for better readability in console output
+    html_output_path = base_path + ".html"
+
+    # Collect all run fragments first and encode them in one go
+    parts = []
+    for idx, _, label, hit_rate in simulation_configs:
+        parts.append(html_run_header(idx, total_runs, hit_rate, label))
+        parts.append("\n")
+        parts.append(report_tables[idx - 1])
+        parts.append("\n")
+
+    with open(html_output_path, "wb") as html_file:
+        html_file.write(_HTML_PROLOGUE)
+        html_file.write("".join(parts).encode("utf-8"))
+        html_file.write(_HTML_EPILOGUE)
+
+    # Strip the HTML tags once; the console output and the CSV extraction both use the plain text
+    clean_tables = [TAG_RE.sub("", table_html) for table_html in html_tables]
+
+    # Print all simulation results to console
+    for idx, clean_text in enumerate(clean_tables, start=1):
         print(f"\n🔹 Simulation Run {idx} Results:")
         print(clean_text)
 
     print("\n✅ Simulation results successfully displayed in the console.")
     print(f"\n✅ HTML overview successfully created: {html_output_path}")
 
-    # Generate timestamp for the filename
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    csv_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.csv")
-    excel_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.xlsx")
-
     csv_data = []
 
     # Iterate through all simulations
-    for idx, table_html in html_tables:
-        table_text = re.sub(r"<.*?>", "", table_html)  # Remove HTML tags for clean processing
-
+    for idx, table_text in enumerate(clean_tables, start=1):
         # Extract simulation settings before processing strategies
         simulation_settings = extract_simulation_settings(table_text)  
 
@@ -372,33 +380,16 @@ def main():
                 }
                 csv_data.append(strategy_data)
 
-    # Remove duplicate strategy entries
-    unique_csv_data = []
-    seen_strategies = set()
-
-    for entry in csv_data:
-        strategy_key = (entry["Run Index"], entry["Strategy"])
-        if strategy_key not in seen_strategies:
-            seen_strategies.add(strategy_key)
-            unique_csv_data.append(entry)
-
-    # Create DataFrame and write to CSV
-    df = pd.DataFrame(unique_csv_data)
-    df.to_csv(csv_output_path, index=False, sep=";", encoding="utf-8-sig")
-    print(f"\n✅ CSV file successfully created: {csv_output_path}")
+    # Remove duplicate strategy entries once; all writers share the list and its DataFrame
+    unique_csv_data, df = unique_results(csv_data)
 
-    # Create DataFrame and write to XLSX
-    df.to_excel(excel_output_path, index=False, engine="openpyxl")
-    print(f"\n✅ Excel file successfully created: {excel_output_path}")
-
-    # Save results in JSON format
-    json_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.json")
-    save_json(unique_csv_data, results_dir, timestamp)
-    print(f"\n✅ JSON file successfully created: {json_output_path}")
-
-    # Save results in Parquet format
-    save_parquet(unique_csv_data, results_dir, timestamp)
-    print(f"\n✅ Parquet file successfully created: {os.path.join(results_dir, f'simulation_runs_{timestamp}.parquet')}")
+    # Write CSV, XLSX, JSON, Parquet, Feather and SQLite files
+    # A failed format is reported and skipped, the remaining outputs and steps still run
+    for label, path, error in save_all(unique_csv_data, df, base_path):
+        if error is not None:
+            print(f"\n⚠ Error writing {label}: {error}")
+        else:
+            print(f"\n✅ {label} successfully created: {path}")
 
     # Write results to InfluxDB (if integrating with InfluxDB)
     # from influx_handler import write_to_influxdb
@@ -419,11 +410,6 @@ def main():
     else:
         print("\nℹ️ InfluxDB usage is disabled in configuration.")
 
-    #sqlite3 output
-    db_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.db")
-    save_sql(unique_csv_data, results_dir, timestamp)
-    print(f"\n✅ SQLite database file successfully created: {db_path}")
-
 
     # Ask user if the REST API should be started
     timeout_setting = config.get("api_timeout", 60)
@@ -0,0 +1,4 @@
+import yaml
+
+# Use the libyaml C parser when PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
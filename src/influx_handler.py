@@ -1,42 +1,102 @@
+import atexit
+import functools
+import math
+import numbers
 import yaml
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.write_api import SYNCHRONOUS
+from src.config_handler import YAML_LOADER
 
+# Parsed once per process; callers treat the returned dict as read-only
+@functools.lru_cache(maxsize=1)
 def load_config():
     with open("dps_config.yaml", "r", encoding="utf-8") as file:
-        return yaml.safe_load(file)
+        return yaml.load(file, Loader=YAML_LOADER)
 
 import socket
+import time
 from urllib.parse import urlparse
 
+# A probe result is reused for this many seconds, so back-to-back checks cost one connect
+REACHABLE_TTL = 30
+_reachable_cache = {}
+
 def is_influxdb_reachable(url, timeout=2):
     """Check if the InfluxDB server is reachable."""
+    now = time.monotonic()
+    cached = _reachable_cache.get(url)
+    if cached is not None and now - cached[0] < REACHABLE_TTL:
+        return cached[1]
     try:
         parsed = urlparse(url)
         host = parsed.hostname
         port = parsed.port or 80
         with socket.create_connection((host, port), timeout):
-            return True
+            reachable = True
     except Exception:
-        return False
+        reachable = False
+    _reachable_cache[url] = (now, reachable)
+    return reachable
+
+# Created on first use, so importing this module does no I/O
+_client = None
+_write_api = None
+
+def _get_client(config):
+    """Returns the shared InfluxDB client and its write API, creating them on first call."""
+    global _client, _write_api
+    if _client is None:
+        # (connect, read) timeouts in milliseconds, so a dead server fails fast
+        _client = InfluxDBClient(url=config["influxdb_url"], token=config["influxdb_token"], org=config["influxdb_org"],
+                                 timeout=(2_000, 5_000))
+        # All points go out in one synchronous request, so write errors reach the caller
+        _write_api = _client.write_api(write_options=SYNCHRONOUS)
+        atexit.register(_client.close)
+    return _client, _write_api
+
+# Fields in the sorted order Point would emit them
+LINE_FIELDS = ("avg_loss", "avg_win", "hit_rate")
+
+def _format_field(value):
+    """Formats a field value the way Point does; None for values it would drop."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, numbers.Integral):
+        return f"{value}i"
+    if isinstance(value, str):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    if not math.isfinite(value):
+        return None
+    text = str(value)
+    return text[:-2] if text.endswith(".0") else text
+
+def to_line_protocol(entry):
+    """
+    Builds the line protocol for one result entry directly as a string, equal to what
+    Point("simulation_results").tag("source", "my_simulator").field(...) would produce.
+    Returns an empty string when no field is writable.
+    """
+    fields = []
+    for key in LINE_FIELDS:
+        text = _format_field(entry.get(key, 0))
+        if text is not None:
+            fields.append(f"{key}={text}")
+    if not fields:
+        return ""
+    return "simulation_results,source=my_simulator " + ",".join(fields)
 
 def write_to_influxdb(data):
     """Writes simulation results to InfluxDB."""
+    if not data:
+        return
     config = load_config()
-    client = InfluxDBClient(url=config["influxdb_url"], token=config["influxdb_token"], org=config["influxdb_org"])
-    write_api = client.write_api()
-
-    for entry in data:
-        point = (
-            Point("simulation_results")
-            .tag("source", "my_simulator")
-            .field("hit_rate", entry.get("hit_rate", 0))
-            .field("avg_win", entry.get("avg_win", 0))
-            .field("avg_loss", entry.get("avg_loss", 0))
-        )
-        write_api.write(bucket=config["influxdb_bucket"], record=point)
+    if not is_influxdb_reachable(config["influxdb_url"]):
+        raise ConnectionError(f"InfluxDB at {config['influxdb_url']} is unreachable")
+    _, write_api = _get_client(config)
 
-    #print("\n✅ Simulation results successfully written to InfluxDB!")
-    client.close()
+    lines = [line for line in map(to_line_protocol, data) if line]
+    write_api.write(bucket=config["influxdb_bucket"], record=lines)
 
-config = load_config()
-client = InfluxDBClient(url=config["influxdb_url"], token=config["influxdb_token"], org=config["influxdb_org"])
+    #print("\n✅ Simulation results successfully written to InfluxDB!")
@@ -4,131 +4,191 @@ import re
 import openpyxl  # (.xlsx)
 import json
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
-def save_html(html_tables, html_blocks, results_dir, timestamp):
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+try:
+    import xlsxwriter  # noqa: F401 (nur als pandas-Engine verwendet)
+    EXCEL_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# Entfernt HTML-Tags; [^>\n] passt auf dieselben Tags wie <.*?>, ohne Backtracking
+TAG_RE = re.compile(r"<[^>\n]*>")
+
+def results_base(results_dir, timestamp):
+    """Gemeinsamer Pfad (ohne Endung) für alle Ausgabedateien eines Laufs."""
+    return os.path.join(results_dir, f"simulation_runs_{timestamp}")
+
+def save_html(html_tables, html_blocks, base_path):
     """Speichert die Simulationsergebnisse als HTML-Datei mit korrekter Formatierung."""
-    html_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.html")
+    if not html_tables:
+        return None
+    html_output_path = base_path + ".html"
 
-    with open(html_output_path, "w", encoding="utf-8") as html_file:
-        html_file.write("<html><head><meta charset='utf-8'><title>Simulation Runs</title>")
-        html_file.write("<style> body { font-size: 1.18em; font-family: Arial, sans-serif; background: #f7f7fa; } h2 { font-size: 1.7em; color: #222; margin-top: 1.2em; } </style></head><body>\n")
-        html_file.write("<h2>Übersicht der Simulationsergebnisse</h2>\n")
+    # Teile sammeln und die Datei mit einem einzigen write schreiben
+    parts = [
+        "<html><head><meta charset='utf-8'><title>Simulation Runs</title>",
+        "<style> body { font-size: 1.18em; font-family: Arial, sans-serif; background: #f7f7fa; } h2 { font-size: 1.7em; color: #222; margin-top: 1.2em; } </style></head><body>\n",
+        "<h2>Übersicht der Simulationsergebnisse</h2>\n",
+    ]
 
-        for block, (idx, table_html) in zip(html_blocks, html_tables):
-            table_html = re.sub(r"\n", "<br>\n", table_html)  # Setzt korrekte Zeilenumbrüche
-            html_file.write(block + "<br>\n" + table_html + "<br>\n")
+    for block, (_, table_html) in zip(html_blocks, html_tables):
+        table_html = table_html.replace("\n", "<br>\n")  # Setzt korrekte Zeilenumbrüche
+        parts.extend((block, "<br>\n", table_html, "<br>\n"))
 
-        html_file.write("</body></html>\n")
+    parts.append("</body></html>\n")
+
+    # Binär schreiben wie der HTML-Bericht in dps.py: ein encode, keine Zeilenende-Übersetzung
+    with open(html_output_path, "wb") as html_file:
+        html_file.write("".join(parts).encode("utf-8"))
+    return html_output_path
 
 def print_console(html_tables):
     """Zeigt die Simulationsergebnisse in der Konsole an."""
     for idx, table_html in html_tables:
-        clean_text = re.sub(r"<.*?>", "", table_html)  # Entfernt HTML-Tags
+        clean_text = TAG_RE.sub("", table_html)  # Entfernt HTML-Tags
         print(f"\n🔹 Simulation Run {idx} Ergebnisse:")
         print(clean_text)
 
-def save_csv(csv_data, results_dir, timestamp):
-    """Speichert die Simulationsergebnisse als CSV-Datei."""
-    csv_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.csv")
-
-    # Remove doubled entries
-    unique_csv_data = []
-    seen_strategies = set()
-
-    for entry in csv_data:
-        strategy_key = (entry["Run Index"], entry["Strategy"])
-        if strategy_key not in seen_strategies:
-            seen_strategies.add(strategy_key)
-            unique_csv_data.append(entry)
-
-    # Write to CSV in correct order
-    df = pd.DataFrame(unique_csv_data)
+def unique_results(csv_data):
+    """
+    Entfernt doppelte Einträge (gleicher Run Index und gleiche Strategie, der erste bleibt).
+    Gibt die bereinigte Liste der Einträge und den passenden DataFrame zurück.
+    """
+    df = pd.DataFrame(csv_data)
+    if df.empty:
+        return [], df
+    keep = ~df.duplicated(subset=["Run Index", "Strategy"], keep="first").to_numpy()
+    unique_csv_data = [entry for entry, k in zip(csv_data, keep) if k]
+    return unique_csv_data, df[keep].reset_index(drop=True)
+
+def save_csv(df, base_path):
+    """Speichert die (bereits deduplizierten) Simulationsergebnisse als CSV-Datei."""
+    if df.empty:
+        return None
+    csv_output_path = base_path + ".csv"
     df.to_csv(csv_output_path, index=False, sep=";", encoding="utf-8-sig")
-
-def save_excel(csv_data, results_dir, timestamp):
-    """Speichert die Simulationsergebnisse als Excel-Datei."""
-    excel_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.xlsx")
-
-    # Remove doubled entries
-    unique_csv_data = []
-    seen_strategies = set()
-
-    for entry in csv_data:
-        strategy_key = (entry["Run Index"], entry["Strategy"])
-        if strategy_key not in seen_strategies:
-            seen_strategies.add(strategy_key)
-            unique_csv_data.append(entry)
-
-    # Write to Excel-file in correct order
-    df = pd.DataFrame(unique_csv_data)
-    df.to_excel(excel_output_path, index=False, engine="openpyxl")
-
-def save_json(csv_data, results_dir, timestamp):
-    """Speichert die Simulationsergebnisse als JSON-Datei."""
-    json_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.json")
-
-    # Entferne doppelte Einträge
-    unique_json_data = []
-    seen_strategies = set()
-
-    for entry in csv_data:
-        strategy_key = (entry["Run Index"], entry["Strategy"])
-        if strategy_key not in seen_strategies:
-            seen_strategies.add(strategy_key)
-            unique_json_data.append(entry)
-
-    # Schreibe JSON-Datei
-    with open(json_output_path, "w", encoding="utf-8") as json_file:
-        json.dump(unique_json_data, json_file, indent=4, ensure_ascii=False)
-
-def save_parquet(data, results_dir, timestamp):
-    """Save simulation results in Parquet format."""
-    parquet_output_path = os.path.join(results_dir, f"simulation_runs_{timestamp}.parquet")
-    
-    df = pd.DataFrame(data)
-    
-    try:
-        df.to_parquet(parquet_output_path, engine="pyarrow", index=False)
-    except Exception as e:
-        print(f"❌ Error saving Parquet file: {e}")
+    return csv_output_path
+
+def save_excel(df, base_path):
+    """Speichert die (bereits deduplizierten) Simulationsergebnisse als Excel-Datei."""
+    if df.empty:
+        return None
+    excel_output_path = base_path + ".xlsx"
+    # Kein constant_memory: pandas schreibt spaltenweise, der Modus würde Zellen verwerfen
+    df.to_excel(excel_output_path, index=False, engine=EXCEL_ENGINE)
+    return excel_output_path
+
+def save_json(unique_csv_data, base_path):
+    """Speichert die (bereits deduplizierten) Simulationsergebnisse als JSON-Datei."""
+    if not unique_csv_data:
+        return None
+    json_output_path = base_path + ".json"
+
+    # Schreibe JSON-Datei; orjson kann nur mit 2 Leerzeichen einrücken, json.dump schreibt dasselbe Format
+    if HAVE_ORJSON:
+        with open(json_output_path, "wb") as json_file:
+            json_file.write(orjson.dumps(unique_csv_data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(json_output_path, "w", encoding="utf-8") as json_file:
+            json.dump(unique_csv_data, json_file, indent=2, ensure_ascii=False)
+    return json_output_path
+
+def save_parquet(df, base_path):
+    """Save the deduplicated simulation results DataFrame in Parquet format."""
+    if df.empty:
+        return None
+    parquet_output_path = base_path + ".parquet"
+    df.to_parquet(parquet_output_path, engine="pyarrow", index=False, compression="zstd", use_dictionary=True)
     #for debugging only: print(df.head())  # Show first few lines of decoded parquet data
     #for debugging only: print(df)
-
-def save_sql(data, results_dir, timestamp):
+    return parquet_output_path
+
+def save_feather(df, base_path):
+    """Save the deduplicated simulation results DataFrame in Feather (Arrow IPC) format."""
+    if df.empty:
+        return None
+    feather_output_path = base_path + ".feather"
+    df.to_feather(feather_output_path, compression="zstd")
+    return feather_output_path
+
+# Spalten eines Eintrags in der Reihenfolge der INSERT-Platzhalter in save_sql
+SQL_ROW = itemgetter(
+    "Run Index", "Hit Rate (%)", "Mode",
+    "Avg Win (€)", "Avg Loss (€)", "Num Simulations",
+    "Num Trades", "Num Shuffles", "Avg Drawdown (€)", "Profit/MaxDD"
+)
+
+def save_sql(data, base_path):
     """Speichert die Simulationsergebnisse in SQLite-Datenbank im gleichen Ordner wie Parquet."""
-    db_path = os.path.join(results_dir, f"simulation_results_{timestamp}.db")  # SQL-Datei im gleichen Ordner
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Tabelle erstellen, falls sie nicht existiert
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS trade_results (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        run_index INTEGER,
-        hit_rate FLOAT,
-        strategy TEXT,
-        avg_win FLOAT,
-        avg_loss FLOAT,
-        num_simulations INTEGER,
-        num_trades INTEGER,
-        num_shuffles INTEGER,
-        avg_drawdown FLOAT,
-        profit_maxdd FLOAT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    if not data:
+        return None
+    db_path = base_path + ".db"  # SQL-Datei im gleichen Ordner, gleicher Name wie die übrigen Formate
+    # Autocommit-Modus mit explizitem BEGIN: Tabelle und Zeilen landen in genau einer Transaktion,
+    # "with conn" schreibt sie mit COMMIT fest oder rollt sie bei einem Fehler zurück
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # Tabelle erstellen, falls sie nicht existiert
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS trade_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_index INTEGER,
+                hit_rate FLOAT,
+                strategy TEXT,
+                avg_win FLOAT,
+                avg_loss FLOAT,
+                num_simulations INTEGER,
+                num_trades INTEGER,
+                num_shuffles INTEGER,
+                avg_drawdown FLOAT,
+                profit_maxdd FLOAT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+
+            # Daten einfügen (alle Zeilen in einem executemany)
+            conn.executemany("""
+            INSERT INTO trade_results (run_index, hit_rate, strategy, avg_win, avg_loss, num_simulations, num_trades, num_shuffles, avg_drawdown, profit_maxdd)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, map(SQL_ROW, data))
+    finally:
+        conn.close()
+    return db_path
+
+def save_all(unique_csv_data, df, base_path):
+    """
+    Schreibt die Ergebnisse in alle Dateiformate. Gibt (Format, Pfad, Fehler) je Datei in
+    der Reihenfolge der Ausgabe zurück; Fehler ist None, wenn die Datei geschrieben wurde,
+    sonst die Exception des Writers. Die Dateien sind unabhängig voneinander und werden
+    parallel in Threads geschrieben, ein fehlgeschlagener Writer hält die übrigen nicht auf.
+    Ohne Ergebnisse wird keine Datei angelegt.
+    """
+    if not unique_csv_data:
+        return []
+    writers = (
+        ("CSV file", save_csv, df),
+        ("Excel file", save_excel, df),
+        ("JSON file", save_json, unique_csv_data),
+        ("Parquet file", save_parquet, df),
+        ("Feather file", save_feather, df),
+        ("SQLite database file", save_sql, unique_csv_data),
     )
-    """)
-
-    # Daten einfügen
-    for entry in data:
-        cursor.execute("""
-        INSERT INTO trade_results (run_index, hit_rate, strategy, avg_win, avg_loss, num_simulations, num_trades, num_shuffles, avg_drawdown, profit_maxdd)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            entry["Run Index"], entry["Hit Rate (%)"], entry["Mode"],
-            entry["Avg Win (€)"], entry["Avg Loss (€)"], entry["Num Simulations"],
-            entry["Num Trades"], entry["Num Shuffles"], entry["Avg Drawdown (€)"], entry["Profit/MaxDD"]
-        ))
-
-    conn.commit()
-    conn.close()
-
+    with ThreadPoolExecutor(max_workers=len(writers)) as executor:
+        futures = [(label, executor.submit(writer, data, base_path)) for label, writer, data in writers]
+    outcomes = []
+    for label, future in futures:
+        error = future.exception()
+        path = None if error is not None else future.result()
+        if path is not None or error is not None:
+            outcomes.append((label, path, error))
+    return outcomes
@@ -38,370 +38,344 @@
 
 import numpy as np
 import argparse
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import contextlib
+import io
 import json as pyjson
 
-def simulate_trades_dynamic(num_trades, hit_rate, avg_win, avg_loss):
+try:
+    from numba import njit, prange, set_num_threads
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    # Numba is optional; without it the kernels below run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+    prange = range
+    def set_num_threads(n):
+        pass
+
+def pin_numba_threads():
+    """
+    Pool initializer: limits the parallel Numba kernels to one thread, so processes that
+    are already one of several workers don't each start a thread per CPU.
+    """
+    set_num_threads(1)
+
+try:
+    from colorama import Fore, Style, init as colorama_init
+    HAVE_COLORAMA = True
+except ImportError:
+    HAVE_COLORAMA = False
+
+# Compiled kernels are cached on disk when imported by dps.py. The cache records the
+# importing module name, so a direct script run (and its spawned pool workers, which
+# import the script as __mp_main__) compiles fresh instead of reusing it.
+JIT_CACHE = __name__ not in ("__main__", "__mp_main__")
+
+# Trade results are stored as float32 to halve the memory per trade; the kernels read
+# each amount as float64 and accumulate profit and drawdown in float64, so only the
+# stored amounts are rounded
+TRADE_DTYPE = np.float32
+
+# Upper bound on the shuffled trades held in memory at once (16 MB as float32)
+BATCH_TRADES = 1 << 22
+
+def simulate_trades_dynamic(num_trades, hit_rate, avg_win, avg_loss, rng=None):
+    # The last phase takes whatever the first two leave, so the phases always cover num_trades
+    phase_len = int(num_trades * 0.2)
     phases = [
-        {'length': int(num_trades * 0.2), 'hit_rate': min(hit_rate + 0.2, 1.0), 'avg_win': avg_win * 1.1, 'avg_loss': avg_loss * 0.9},
-        {'length': int(num_trades * 0.2), 'hit_rate': max(hit_rate - 0.3, 0.05), 'avg_win': avg_win * 0.9, 'avg_loss': avg_loss * 1.1},
-        {'length': num_trades - int(num_trades * 0.4), 'hit_rate': hit_rate, 'avg_win': avg_win, 'avg_loss': avg_loss}
+        {'length': phase_len, 'hit_rate': min(hit_rate + 0.2, 1.0), 'avg_win': avg_win * 1.1, 'avg_loss': avg_loss * 0.9},
+        {'length': phase_len, 'hit_rate': max(hit_rate - 0.3, 0.05), 'avg_win': avg_win * 0.9, 'avg_loss': avg_loss * 1.1},
+        {'length': num_trades - 2 * phase_len, 'hit_rate': hit_rate, 'avg_win': avg_win, 'avg_loss': avg_loss}
     ]
-    results = []
-    trades_left = num_trades
+    rng = rng or np.random.default_rng()
+    results = np.empty(num_trades, dtype=TRADE_DTYPE)
+    start = 0
     for phase in phases:
-        l = min(phase['length'], trades_left)
-        if l <= 0:
-            continue
-        phase_results = np.random.choice(
-            [phase['avg_win'], -phase['avg_loss']],
-            size=l,
-            p=[phase['hit_rate'], 1 - phase['hit_rate']]
-        )
-        results.extend(phase_results)
-        trades_left -= l
-        if trades_left <= 0:
-            break
-    if trades_left > 0:
-        results.extend(np.random.choice([avg_win, -avg_loss], size=trades_left, p=[hit_rate, 1 - hit_rate]))
-    return np.array(results)
-
-def simulate_trades_markov(num_trades, hit_rate, avg_win, avg_loss, p_win_after_win=0.7, p_win_after_loss=0.5):
-    results = []
-    last_win = np.random.rand() < hit_rate
-    if last_win:
-        results.append(avg_win)
-    else:
-        results.append(-avg_loss)
-    for _ in range(1, num_trades):
-        if last_win:
-            win = np.random.rand() < p_win_after_win
-        else:
-            win = np.random.rand() < p_win_after_loss
-        if win:
-            results.append(avg_win)
+        l = phase['length']
+        # One uniform draw per trade, thresholded against the phase hit rate
+        wins = rng.random(l) < phase['hit_rate']
+        results[start:start + l] = np.where(wins, phase['avg_win'], -phase['avg_loss'])
+        start += l
+    return results
+
+@njit(cache=JIT_CACHE)
+def markov_chain(rng, num_trades, hit_rate, avg_win, avg_loss, p_win_after_win, p_win_after_loss):
+    """ 1st order Markov chain, drawing each uniform from the Generator rng as it goes. """
+    results = np.empty(num_trades, dtype=TRADE_DTYPE)
+    last_win = False
+    for i in range(num_trades):
+        u = rng.random()
+        if i == 0:
+            win = u < hit_rate
+        elif last_win:
+            win = u < p_win_after_win
         else:
-            results.append(-avg_loss)
+            win = u < p_win_after_loss
+        results[i] = avg_win if win else -avg_loss
         last_win = win
-    return np.array(results)
-
-def simulate_trades_markov2(num_trades, hit_rate, avg_win, avg_loss, p_win_ww=0.8, p_win_wl=0.6, p_win_lw=0.5, p_win_ll=0.3):
-    results = []
-    last = [np.random.rand() < hit_rate, np.random.rand() < hit_rate]
-    for win in last:
-        results.append(avg_win if win else -avg_loss)
-    for _ in range(2, num_trades):
-        if last[-2] and last[-1]:
-            p = p_win_ww
-        elif last[-2] and not last[-1]:
-            p = p_win_wl
-        elif not last[-2] and last[-1]:
-            p = p_win_lw
-        else:
-            p = p_win_ll
-        win = np.random.rand() < p
-        results.append(avg_win if win else -avg_loss)
-        last = [last[-1], win]
-    return np.array(results)
-
-def simulate_trades_regime_switch(num_trades, regimes=None):
+    return results
+
+@njit(cache=JIT_CACHE)
+def markov2_chain(rng, num_trades, hit_rate, avg_win, avg_loss, probs):
+    """
+    2nd order Markov chain, drawing uniforms from rng inline; the first two trades
+    use the hit rate. probs holds P(win) indexed by the 2-bit history
+    (previous << 1) | last, i.e. [LL, LW, WL, WW].
+    """
+    results = np.empty(num_trades, dtype=TRADE_DTYPE)
+    history = 0
+    for i in range(num_trades):
+        p = hit_rate if i < 2 else probs[history]
+        win = rng.random() < p
+        results[i] = avg_win if win else -avg_loss
+        history = ((history << 1) | win) & 3
+    return results
+
+def simulate_trades_markov(num_trades, hit_rate, avg_win, avg_loss, p_win_after_win=0.7, p_win_after_loss=0.5, rng=None):
+    return markov_chain(rng or np.random.default_rng(), num_trades,
+                        float(hit_rate), float(avg_win), float(avg_loss),
+                        float(p_win_after_win), float(p_win_after_loss))
+
+def simulate_trades_markov2(num_trades, hit_rate, avg_win, avg_loss, p_win_ww=0.8, p_win_wl=0.6, p_win_lw=0.5, p_win_ll=0.3, rng=None):
+    probs = np.array([p_win_ll, p_win_lw, p_win_wl, p_win_ww], dtype=np.float64)
+    return markov2_chain(rng or np.random.default_rng(), max(num_trades, 2),
+                         float(hit_rate), float(avg_win), float(avg_loss), probs)
+
+def simulate_trades_regime_switch(num_trades, regimes=None, rng=None):
     if regimes is None:
         regimes = [
             {'length': int(num_trades * 0.3), 'hit_rate': 0.9, 'avg_win': 200, 'avg_loss': 100},
             {'length': int(num_trades * 0.2), 'hit_rate': 0.5, 'avg_win': 100, 'avg_loss': 100},
             {'length': num_trades - int(num_trades * 0.5), 'hit_rate': 0.2, 'avg_win': 100, 'avg_loss': 200},
         ]
-    results = []
-    trades_left = num_trades
+    rng = rng or np.random.default_rng()
+    results = np.empty(num_trades, dtype=TRADE_DTYPE)
+    start = 0
     for regime in regimes:
-        l = min(regime['length'], trades_left)
+        l = min(regime['length'], num_trades - start)
         if l <= 0:
             continue
-        phase_results = np.random.choice(
-            [regime['avg_win'], -regime['avg_loss']],
-            size=l,
-            p=[regime['hit_rate'], 1 - regime['hit_rate']]
-        )
-        results.extend(phase_results)
-        trades_left -= l
-        if trades_left <= 0:
+        wins = rng.random(l) < regime['hit_rate']
+        results[start:start + l] = np.where(wins, regime['avg_win'], -regime['avg_loss'])
+        start += l
+        if start >= num_trades:
             break
-    return np.array(results)
-
-def calculate_drawdown(equity_curve):
-    peak = np.maximum.accumulate(equity_curve)
-    drawdowns = equity_curve - peak
-    return np.min(drawdowns)
-
-def strategy_static(results):
-    equity = np.cumsum(results)
-    total_profit = np.sum(results)
-    drawdown = calculate_drawdown(equity)
-    return total_profit, drawdown
-
-def strategy_dynamic(results, condition_func):
-    equity = []
-    position_size = 1
-    state = {'win_streak': 0, 'loss_streak': 0, 'mode': 'trading', 'last_result': 0, 'last2_result': 0}
-
-    for i in range(len(results)):
-        trade_result = results[i] * position_size
-        if state.get('mode', 'trading') == 'trading':
-            equity.append(trade_result)
-        else:
-            equity.append(0)
-
-        # Update streaks
-        if results[i] > 0:
-            state['win_streak'] += 1
-            state['loss_streak'] = 0
-        else:
-            state['loss_streak'] += 1
-            state['win_streak'] = 0
-
-        # Für Strategien, die auf die letzten Trades schauen
-        state['last2_result'] = state.get('last_result', 0)
-        state['last_result'] = results[i]
-
-        position_size, state = condition_func(results[i], position_size, state)
-
-    cumulative_equity = np.cumsum(equity)
-    return np.sum(equity), calculate_drawdown(cumulative_equity)
-
-def make_condition_func(strategy_id):
-    def func(result, size, state):
-        # 1: Konstante Positionsgröße
-        if strategy_id == 1:
-            size = 1
-
-        # 2: Nach Gewinn auf 2 erhöhen, nach Verlust zurück auf 1
-        elif strategy_id == 2:
-            size = 2 if result > 0 else 1
-
-        # 3: Nach Gewinn auf 2 erhöhen, nach Verlust oder 2 Gewinnen zurück auf 1
-        elif strategy_id == 3:
+    return results[:start]
+
+# Trading modes of the dynamic strategies
+MODE_TRADING = 0
+MODE_PAUSE = 1
+
+# Strategy kinds: each one is a sizing rule shared by several strategies
+KIND_CONSTANT = 0          # always size 1
+KIND_WIN_STREAK = 1        # win: size_b once the win streak reaches threshold, else size_a; loss: 1
+KIND_LOSS_STREAK = 2       # loss: size_b once the loss streak reaches threshold, else size_a; win: 1
+KIND_WIN_AFTER_LOSS = 3    # 2 after a win that followed a loss, else 1
+KIND_PAUSE_AFTER_WINS = 4  # pause once the win streak reaches threshold (size_b), else size_a
+KIND_PAUSE_AFTER_WIN = 5   # pause after a win; loss: size_b once the loss streak reaches threshold
+KIND_STREAKS = 6           # size_a after threshold wins, size_b after threshold losses, else 1
+
+# One row per strategy id: kind, threshold, size_a, size_b. Kinds 1, 2, 4 and 5
+# bump their streak once more on top of the per-trade update, as the original
+# per-strategy rules did, so their thresholds compare against that count.
+STRATEGY_TABLE = np.array([
+    [KIND_CONSTANT, 0, 1, 1],          # 0: unused
+    [KIND_CONSTANT, 0, 1, 1],          # 1: Konstante Positionsgröße
+    [KIND_WIN_STREAK, 0, 1, 2],        # 2: Nach Gewinn auf 2 erhöhen, nach Verlust zurück auf 1
+    [KIND_WIN_STREAK, 2, 2, 1],        # 3: Nach Gewinn auf 2 erhöhen, nach Verlust oder 2 Gewinnen zurück auf 1
+    [KIND_WIN_STREAK, 3, 2, 1],        # 4: Nach Gewinn auf 2 erhöhen, nach Verlust oder 3 Gewinnen zurück auf 1
+    [KIND_WIN_STREAK, 4, 2, 1],        # 5: Nach Gewinn auf 2 erhöhen, nach Verlust oder 4 Gewinnen zurück auf 1
+    [KIND_LOSS_STREAK, 0, 1, 2],       # 6: Nach Verlust auf 2 erhöhen, nach Gewinn zurück auf 1
+    [KIND_LOSS_STREAK, 2, 1, 2],       # 7: Nach 2 Verlusten auf 2 erhöhen, nach Gewinn zurück auf 1
+    [KIND_LOSS_STREAK, 3, 1, 2],       # 8: Nach 3 Verlusten auf 2 erhöhen, nach Gewinn zurück auf 1
+    [KIND_PAUSE_AFTER_WINS, 0, 1, 1],  # 9: Nach 1 Gewinn pausieren bis zum nächsten Verlust
+    [KIND_PAUSE_AFTER_WINS, 2, 1, 1],  # 10: Nach 2 Gewinnen pausieren bis zum nächsten Verlust
+    [KIND_PAUSE_AFTER_WINS, 3, 1, 1],  # 11: Nach 3 Gewinnen pausieren bis zum nächsten Verlust
+    [KIND_PAUSE_AFTER_WINS, 4, 1, 1],  # 12: Nach 4 Gewinnen pausieren bis zum nächsten Verlust
+    [KIND_WIN_STREAK, 2, 1, 2],        # 13: Nach 2 Gewinnen auf 2 erhöhen, nach 2 Verlusten zurück auf 1
+    [KIND_WIN_AFTER_LOSS, 0, 1, 2],    # 14: Nach 1 Gewinn auf 2 erhöhen, aber nur wenn davor 1 Verlust war
+    [KIND_PAUSE_AFTER_WINS, 2, 1, 2],  # 15: Nach 2 Gewinnen in Folge pausieren bis 1 Verlust, dann auf 2 erhöhen
+    [KIND_PAUSE_AFTER_WIN, 2, 1, 2],   # 16: Nach 2 Verlusten auf 2 erhöhen, nach 1 Gewinn pausieren bis zum nächsten Verlust
+    [KIND_WIN_AFTER_LOSS, 0, 1, 2],    # 17: Nach 1 Gewinn auf 2 erhöhen, nur wenn davor 1 Verlust war, sonst auf 1
+    [KIND_WIN_STREAK, 3, 1, 3],        # 18: Nach 3 Gewinnen auf 3 erhöhen, nach 1 Verlust zurück auf 1
+    [KIND_STREAKS, 2, 2, 3],           # 19: Nach 2 Gewinnen auf 2 erhöhen, nach 2 Verlusten auf 3 erhöhen, sonst auf 1
+    [KIND_STREAKS, 2, 1, 3],           # 20: Nach 2 Verlusten auf 3 erhöhen, nach Gewinn zurück auf 1
+], dtype=np.int8)
+
+def make_kind_kernel(kind):
+    """
+    Compiles the strategy loop for one kind. kind is a constant of the closure, so the
+    compiler drops the branches of all other kinds from the per-trade loop.
+    """
+    @njit(cache=JIT_CACHE)
+    def run_kind(results, threshold, size_a, size_b):
+        position_size = 1
+        win_streak = 0
+        loss_streak = 0
+        mode = MODE_TRADING
+        last_result = 0.0
+        last2_result = 0.0
+        # Equity and drawdown are tracked while trading, no equity curve is stored
+        cumulative = 0.0
+        peak = -np.inf
+        max_dd = 0.0
+
+        for i in range(len(results)):
+            # Read as float64 so the sums do not drop to float32 when Numba is missing
+            result = float(results[i])
+            # Paused trades leave equity, peak and drawdown untouched
+            if mode == MODE_TRADING:
+                cumulative += result * position_size
+                if cumulative > peak:
+                    peak = cumulative
+                if cumulative - peak < max_dd:
+                    max_dd = cumulative - peak
+
+            # Update streaks
             if result > 0:
-                state['win_streak'] += 1
-                if state['win_streak'] >= 2:
-                    size = 1
-                else:
-                    size = 2
+                win_streak += 1
+                loss_streak = 0
             else:
-                size = 1
-                state['win_streak'] = 0
+                loss_streak += 1
+                win_streak = 0
 
-        # 4: Nach Gewinn auf 2 erhöhen, nach Verlust oder 3 Gewinnen zurück auf 1
-        elif strategy_id == 4:
-            if result > 0:
-                state['win_streak'] += 1
-                if state['win_streak'] >= 3:
-                    size = 1
-                else:
-                    size = 2
-            else:
-                size = 1
-                state['win_streak'] = 0
-
-        # 5: Nach Gewinn auf 2 erhöhen, nach Verlust oder 4 Gewinnen zurück auf 1
-        elif strategy_id == 5:
-            if result > 0:
-                state['win_streak'] += 1
-                if state['win_streak'] >= 4:
-                    size = 1
-                else:
-                    size = 2
-            else:
-                size = 1
-                state['win_streak'] = 0
-
-        # 6: Nach Verlust auf 2 erhöhen, nach Gewinn zurück auf 1
-        elif strategy_id == 6:
-            size = 2 if result <= 0 else 1
-
-        # 7: Nach 2 Verlusten auf 2 erhöhen, nach Gewinn zurück auf 1
-        elif strategy_id == 7:
-            if result > 0:
-                size = 1
-                state['loss_streak'] = 0
-            else:
-                state['loss_streak'] += 1
-                size = 2 if state['loss_streak'] >= 2 else 1
+            # Für Strategien, die auf die letzten Trades schauen
+            last2_result = last_result
+            last_result = result
 
-        # 8: Nach 3 Verlusten auf 2 erhöhen, nach Gewinn zurück auf 1
-        elif strategy_id == 8:
-            if result > 0:
-                size = 1
-                state['loss_streak'] = 0
-            else:
-                state['loss_streak'] += 1
-                size = 2 if state['loss_streak'] >= 3 else 1
-
-        # 9: Nach 1 Gewinn pausieren bis zum nächsten Verlust
-        elif strategy_id == 9:
-            if state.get('mode', 'trading') == 'trading':
-                if result > 0:
-                    state['mode'] = 'pause'
-                size = 1
-            elif state.get('mode') == 'pause':
+            # Pausing strategies resume with size 1 on the next loss
+            if mode == MODE_PAUSE:
                 if result <= 0:
-                    state['mode'] = 'trading'
-                    size = 1
+                    mode = MODE_TRADING
+                    win_streak = 0
+                    position_size = 1
                 else:
-                    size = 0  # Pause: keine Position
+                    position_size = 0  # Pause: keine Position
 
-        # 10: Nach 2 Gewinnen pausieren bis zum nächsten Verlust
-        elif strategy_id == 10:
-            if state.get('mode', 'trading') == 'trading':
+            elif kind == KIND_WIN_STREAK:
                 if result > 0:
-                    state['win_streak'] += 1
-                    if state['win_streak'] >= 2:
-                        state['mode'] = 'pause'
+                    win_streak += 1
+                    position_size = size_b if win_streak >= threshold else size_a
                 else:
-                    state['win_streak'] = 0
-                size = 1
-            elif state.get('mode') == 'pause':
-                if result <= 0:
-                    state['mode'] = 'trading'
-                    state['win_streak'] = 0
-                    size = 1
-                else:
-                    size = 0  # Pause: keine Position
+                    position_size = 1
+                    win_streak = 0
 
-        # 11: Nach 3 Gewinnen pausieren bis zum nächsten Verlust
-        elif strategy_id == 11:
-            if state.get('mode', 'trading') == 'trading':
+            elif kind == KIND_LOSS_STREAK:
                 if result > 0:
-                    state['win_streak'] += 1
-                    if state['win_streak'] >= 3:
-                        state['mode'] = 'pause'
+                    position_size = 1
+                    loss_streak = 0
                 else:
-                    state['win_streak'] = 0
-                size = 1
-            elif state.get('mode') == 'pause':
-                if result <= 0:
-                    state['mode'] = 'trading'
-                    state['win_streak'] = 0
-                    size = 1
-                else:
-                    size = 0  # Pause: keine Position
+                    loss_streak += 1
+                    position_size = size_b if loss_streak >= threshold else size_a
 
-        # 12: Nach 4 Gewinnen pausieren bis zum nächsten Verlust
-        elif strategy_id == 12:
-            if state.get('mode', 'trading') == 'trading':
-                if result > 0:
-                    state['win_streak'] += 1
-                    if state['win_streak'] >= 4:
-                        state['mode'] = 'pause'
-                else:
-                    state['win_streak'] = 0
-                size = 1
-            elif state.get('mode') == 'pause':
-                if result <= 0:
-                    state['mode'] = 'trading'
-                    state['win_streak'] = 0
-                    size = 1
-                else:
-                    size = 0  # Pause: keine Position
-
-        # 13: Nach 2 Gewinnen auf 2 erhöhen, nach 2 Verlusten zurück auf 1
-        elif strategy_id == 13:
-            if result > 0:
-                state['win_streak'] += 1
-                if state['win_streak'] >= 2:
-                    size = 2
-            else:
-                state['loss_streak'] += 1
-                if state['loss_streak'] >= 2:
-                    size = 1
-
-        # 14: Nach 1 Gewinn und 1 Verlust auf 2 erhöhen, sonst auf 1
-        elif strategy_id == 14:
-            if result > 0 and state.get('last2_result', 0) <= 0:
-                size = 2
-            else:
-                size = 1
+            elif kind == KIND_WIN_AFTER_LOSS:
+                position_size = 2 if result > 0 and last2_result <= 0 else 1
 
-        # 15: Nach 2 Gewinnen in Folge pausieren bis 1 Verlust, dann auf 2 erhöhen
-        elif strategy_id == 15:
-            if state.get('mode', 'trading') == 'trading':
+            elif kind == KIND_PAUSE_AFTER_WINS:
                 if result > 0:
-                    state['win_streak'] += 1
-                    if state['win_streak'] >= 2:
-                        state['mode'] = 'pause'
-                        size = 2
+                    win_streak += 1
+                    if win_streak >= threshold:
+                        mode = MODE_PAUSE
+                        position_size = size_b
                     else:
-                        size = 1
+                        position_size = size_a
                 else:
-                    state['win_streak'] = 0
-                    size = 1
-            elif state.get('mode') == 'pause':
-                if result <= 0:
-                    state['mode'] = 'trading'
-                    state['win_streak'] = 0
-                    size = 1
-                else:
-                    size = 0  # Pause: keine Position
+                    win_streak = 0
+                    position_size = 1
 
-        # 16: Nach 2 Verlusten auf 2 erhöhen, nach 1 Gewinn pausieren bis zum nächsten Verlust
-        elif strategy_id == 16:
-            if state.get('mode', 'trading') == 'trading':
+            elif kind == KIND_PAUSE_AFTER_WIN:
                 if result > 0:
-                    state['mode'] = 'pause'
-                    size = 1
+                    mode = MODE_PAUSE
+                    position_size = 1
                 else:
-                    state['loss_streak'] += 1
-                    if state['loss_streak'] >= 2:
-                        size = 2
-                    else:
-                        size = 1
-            elif state.get('mode') == 'pause':
-                if result <= 0:
-                    state['mode'] = 'trading'
-                    size = 1
+                    loss_streak += 1
+                    position_size = size_b if loss_streak >= threshold else size_a
+
+            elif kind == KIND_STREAKS:
+                if win_streak >= threshold:
+                    position_size = size_a
+                elif loss_streak >= threshold:
+                    position_size = size_b
                 else:
-                    size = 0  # Pause: keine Position
-
-        # 17: Nach 1 Gewinn auf 2 erhöhen, aber nur wenn davor 1 Verlust war, sonst auf 1
-        elif strategy_id == 17:
-            if result > 0 and state.get('last2_result', 0) <= 0:
-                size = 2
-            else:
-                size = 1
-
-        # 18: Nach 3 Gewinnen auf 3 erhöhen, nach 1 Verlust zurück auf 1
-        elif strategy_id == 18:
-            if result > 0:
-                state['win_streak'] += 1
-                if state['win_streak'] >= 3:
-                    size = 3
-            else:
-                size = 1
-                state['win_streak'] = 0
-
-        # 19: Nach 2 Gewinnen auf 2 erhöhen, nach 2 Verlusten auf 3 erhöhen, sonst auf 1
-        elif strategy_id == 19:
-            if state['win_streak'] >= 2:
-                size = 2
-            elif state['loss_streak'] >= 2:
-                size = 3
-            else:
-                size = 1
+                    position_size = 1
 
-        # 20: Nach 1 Gewinn auf 2 erhöhen, nach 2 Verlusten auf 3 erhöhen, nach Gewinn zurück auf 1
-        elif strategy_id == 20:
-            if result > 0:
-                size = 1
-            elif state['loss_streak'] >= 2:
-                size = 3
-            elif result > 0:
-                size = 2
             else:
-                size = 1
-
-        else:
-            size = 1
-
-        return size, state
-    return func
+                position_size = 1
+
+        return cumulative, max_dd
+
+    return run_kind
+
+run_constant = make_kind_kernel(KIND_CONSTANT)
+run_win_streak = make_kind_kernel(KIND_WIN_STREAK)
+run_loss_streak = make_kind_kernel(KIND_LOSS_STREAK)
+run_win_after_loss = make_kind_kernel(KIND_WIN_AFTER_LOSS)
+run_pause_after_wins = make_kind_kernel(KIND_PAUSE_AFTER_WINS)
+run_pause_after_win = make_kind_kernel(KIND_PAUSE_AFTER_WIN)
+run_streaks = make_kind_kernel(KIND_STREAKS)
+
+if not HAVE_NUMBA:
+    def run_constant(results, threshold=0, size_a=1, size_b=1):
+        """
+        Constant position size 1, vectorized for runs without Numba. results may also be
+        a (shuffles, trades) batch; then profit and drawdown come back per row.
+        """
+        if results.shape[-1] == 0:
+            return 0.0, 0.0
+        equity = np.cumsum(results, axis=-1, dtype=np.float64)
+        total = equity[..., -1].copy()
+        equity -= np.maximum.accumulate(equity, axis=-1)
+        return total, equity.min(axis=-1)
+
+@njit(cache=JIT_CACHE)
+def run_strategy(results, strategy_id):
+    """ Runs one dynamic position sizing strategy over a trade sequence and returns (profit, drawdown). """
+    kind = STRATEGY_TABLE[strategy_id, 0]
+    threshold = STRATEGY_TABLE[strategy_id, 1]
+    size_a = STRATEGY_TABLE[strategy_id, 2]
+    size_b = STRATEGY_TABLE[strategy_id, 3]
+    # Dispatch once per sequence to the kernel compiled for this kind
+    if kind == KIND_WIN_STREAK:
+        return run_win_streak(results, threshold, size_a, size_b)
+    elif kind == KIND_LOSS_STREAK:
+        return run_loss_streak(results, threshold, size_a, size_b)
+    elif kind == KIND_WIN_AFTER_LOSS:
+        return run_win_after_loss(results, threshold, size_a, size_b)
+    elif kind == KIND_PAUSE_AFTER_WINS:
+        return run_pause_after_wins(results, threshold, size_a, size_b)
+    elif kind == KIND_PAUSE_AFTER_WIN:
+        return run_pause_after_win(results, threshold, size_a, size_b)
+    elif kind == KIND_STREAKS:
+        return run_streaks(results, threshold, size_a, size_b)
+    return run_constant(results, threshold, size_a, size_b)
+
+@njit(cache=JIT_CACHE, parallel=True)
+def run_all_on_paths(paths):
+    """ Runs all 20 strategies on every row of paths in parallel; returns profits and drawdowns as (rows, 20). """
+    rows = paths.shape[0]
+    profits = np.empty((rows, 20))
+    drawdowns = np.empty((rows, 20))
+    for m in prange(rows):
+        for i in range(1, 21):
+            profits[m, i - 1], drawdowns[m, i - 1] = run_strategy(paths[m], i)
+    return profits, drawdowns
+
+if not HAVE_NUMBA:
+    def run_all_on_paths(paths):
+        """ Without Numba: the static strategy runs on all paths in one NumPy pass. """
+        profits = np.empty((len(paths), 20))
+        drawdowns = np.empty((len(paths), 20))
+        profits[:, 0], drawdowns[:, 0] = run_constant(paths)
+        for m in range(len(paths)):
+            for i in range(2, 21):
+                profits[m, i - 1], drawdowns[m, i - 1] = run_strategy(paths[m], i)
+        return profits, drawdowns
 
 #origdef find_break_even_hit_rate(avg_win, avg_loss):
 #orig    return avg_loss / (avg_win + avg_loss)
@@ -442,11 +416,90 @@ def find_break_even_hit_rate(avg_win, avg_loss, mode):
     return base_rate
 #new function end
 
+def simulate_paths(params, rng):
+    """ Draws one trade sequence for the model selected in params from the Generator rng. """
+    if params["use_regime"]:
+        return simulate_trades_regime_switch(params["num_trades"], params["regimes"], rng)
+    elif params["use_markov2"]:
+        return simulate_trades_markov2(
+            params["num_trades"], params["hit_rate"], params["avg_win"], params["avg_loss"],
+            params["p_win_ww"], params["p_win_wl"], params["p_win_lw"], params["p_win_ll"], rng
+        )
+    elif params["use_markov"]:
+        return simulate_trades_markov(
+            params["num_trades"], params["hit_rate"], params["avg_win"], params["avg_loss"],
+            params["p_win_after_win"], params["p_win_after_loss"], rng
+        )
+    return simulate_trades_dynamic(params["num_trades"], params["hit_rate"], params["avg_win"], params["avg_loss"], rng)
+
+def simulate_chunk(rngs, params, out=None):
+    """
+    Runs one simulation with its shuffles per Generator in rngs and returns profits and
+    drawdowns as (20, len(rngs) * num_mc_shuffles) arrays, one row per strategy. out can
+    pass in the (profits, drawdowns) arrays to fill.
+    """
+    n_sims = len(rngs)
+    shuffles = params["num_mc_shuffles"]
+    if out is None:
+        out = (np.empty((20, n_sims * shuffles)), np.empty((20, n_sims * shuffles)))
+    profits, drawdowns = out
+
+    def run_block(paths, cols):
+        batch_profits, batch_drawdowns = run_all_on_paths(paths)
+        profits[:, cols] = batch_profits.T
+        drawdowns[:, cols] = batch_drawdowns.T
+
+    # Simulations are processed in blocks of about BATCH_TRADES shuffled trades. A block
+    # holds whole simulations while they fit; when the shuffles of one simulation alone
+    # exceed the budget, they are split over several blocks instead. The path matrix thus
+    # stays bounded (by a single sequence at least) however many shuffles are requested.
+    # A simulation draws its trades and shuffles from its own stream only, so results do
+    # not depend on how simulations are split into blocks or across workers.
+    num_trades = params["num_trades"]
+    sims_per_block = BATCH_TRADES // max(1, shuffles * num_trades)
+    if sims_per_block >= 1:
+        for first in range(0, n_sims, sims_per_block):
+            block_rngs = rngs[first:first + sims_per_block]
+            n = len(block_rngs)
+            # Every simulated sequence repeated once per shuffle, then each row shuffled in place
+            paths = np.repeat(np.stack([simulate_paths(params, r) for r in block_rngs]), shuffles, axis=0)
+            for k, r in enumerate(block_rngs):
+                rows = paths[k * shuffles:(k + 1) * shuffles]
+                r.permuted(rows, axis=1, out=rows)
+            run_block(paths, slice(first * shuffles, (first + n) * shuffles))
+    else:
+        shuffle_block = max(1, BATCH_TRADES // max(1, num_trades))
+        for i, r in enumerate(rngs):
+            trades = simulate_paths(params, r)[np.newaxis]
+            # permuted walks the rows in order, so shuffling in row blocks draws the same
+            # permutations as shuffling all rows of the simulation at once
+            for first in range(0, shuffles, shuffle_block):
+                n = min(shuffle_block, shuffles - first)
+                paths = np.repeat(trades, n, axis=0)
+                r.permuted(paths, axis=1, out=paths)
+                run_block(paths, slice(i * shuffles + first, i * shuffles + first + n))
+
+    return profits, drawdowns
+
+def simulate_chunk_shared(rngs, params, shm_name, trials, start):
+    """
+    Pool worker: runs simulate_chunk and writes its results straight into the trial
+    columns start.. of the shared (2, 20, trials) result block, instead of returning them.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((2, 20, trials), dtype=np.float64, buffer=shm.buf)
+        stop = start + len(rngs) * params["num_mc_shuffles"]
+        simulate_chunk(rngs, params, out=(block[0, :, start:stop], block[1, :, start:stop]))
+        del block
+    finally:
+        shm.close()
+
 def run_all_strategies(
     hit_rate, avg_win, avg_loss, num_trades, num_simulations, num_mc_shuffles,
     use_markov=False, p_win_after_win=0.7, p_win_after_loss=0.5,
     use_markov2=False, p_win_ww=0.8, p_win_wl=0.6, p_win_lw=0.5, p_win_ll=0.3,
-    use_regime=False, regimes=None
+    use_regime=False, regimes=None, workers=1, rng=None
 ):
     descriptions = {
         1: "Constant position size 1",
@@ -471,51 +524,63 @@ def run_all_strategies(
         20: "Increase to 2 after 1 win, to 3 after 2 losses, reset to 1 after win",
     }
 
-    summary = {i: [] for i in range(1, 21)}
-
-    for _ in range(num_simulations):
-        if use_regime:
-            base_results = simulate_trades_regime_switch(num_trades, regimes)
-        elif use_markov2:
-            base_results = simulate_trades_markov2(
-                num_trades, hit_rate, avg_win, avg_loss,
-                p_win_ww, p_win_wl, p_win_lw, p_win_ll
-            )
-        elif use_markov:
-            base_results = simulate_trades_markov(
-                num_trades, hit_rate, avg_win, avg_loss,
-                p_win_after_win, p_win_after_loss
-            )
-        else:
-            base_results = simulate_trades_dynamic(num_trades, hit_rate, avg_win, avg_loss)
-        for _ in range(num_mc_shuffles):
-            np.random.shuffle(base_results)
-            for i in range(1, 21):
-                if i == 1:
-                    profit, dd = strategy_static(base_results)
-                else:
-                    cond_func = make_condition_func(i)
-                    profit, dd = strategy_dynamic(base_results, cond_func)
-
-                try:
-                    profit = float(profit)
-                    dd = float(dd)
-                except Exception as e:
-                    print(f"Error parsing profit/dd for strategy {i}: {profit}, {dd}")
-                    raise
+    params = dict(
+        hit_rate=hit_rate, avg_win=avg_win, avg_loss=avg_loss, num_trades=num_trades,
+        num_mc_shuffles=num_mc_shuffles,
+        use_markov=use_markov, p_win_after_win=p_win_after_win, p_win_after_loss=p_win_after_loss,
+        use_markov2=use_markov2, p_win_ww=p_win_ww, p_win_wl=p_win_wl, p_win_lw=p_win_lw, p_win_ll=p_win_ll,
+        use_regime=use_regime, regimes=regimes
+    )
 
-                summary[i].append((profit, dd))
+    # A fresh PCG64 Generator per call, so forked worker processes never share a stream.
+    # Every simulation gets its own child stream, which makes a seeded rng reproduce the
+    # same results for any worker count.
+    rng = rng or np.random.default_rng()
+    sim_rngs = rng.spawn(num_simulations)
+    if not workers:
+        # Size to the CPUs this process may actually use (cgroup/affinity limits in containers)
+        try:
+            workers = len(os.sched_getaffinity(0))
+        except AttributeError:
+            workers = os.cpu_count() or 1
+    workers = max(1, min(workers, num_simulations))
+    if workers == 1:
+        profits, drawdowns = simulate_chunk(sim_rngs, params)
+    else:
+        # Each worker takes a contiguous slice of the simulations and writes its results
+        # into shared memory rather than pickling them back
+        bounds = np.linspace(0, num_simulations, workers + 1).astype(int)
+        trials = num_simulations * num_mc_shuffles
+        shm = shared_memory.SharedMemory(create=True, size=2 * 20 * trials * 8)
+        try:
+            tasks = [(sim_rngs[lo:hi], params, shm.name, trials, int(lo) * num_mc_shuffles) for lo, hi in zip(bounds[:-1], bounds[1:])]
+            # Spawned rather than forked: forking after Numba has started its threading
+            # layer (e.g. an earlier workers=1 call) leaves the process hanging at exit
+            with multiprocessing.get_context("spawn").Pool(workers, initializer=pin_numba_threads) as pool:
+                pool.starmap(simulate_chunk_shared, tasks)
+            block = np.ndarray((2, 20, trials), dtype=np.float64, buffer=shm.buf)
+            profits, drawdowns = block[0].copy(), block[1].copy()
+            del block
+        finally:
+            shm.close()
+            shm.unlink()
+
+    # Per-strategy statistics as vector reductions over the trial axis
+    avg_profits = profits.mean(axis=1)
+    avg_drawdowns = drawdowns.mean(axis=1)
+    min_profits = profits.min(axis=1)
+    max_profits = profits.max(axis=1)
+    min_dds = drawdowns.min(axis=1)
+    max_dds = drawdowns.max(axis=1)
 
     summary_final = []
     for i in range(1, 21):
-        profits = [x[0] for x in summary[i]]
-        drawdowns = [x[1] for x in summary[i]]
-        avg_profit = np.mean(profits)
-        avg_drawdown = np.mean(drawdowns)
-        min_profit = np.min(profits)
-        max_profit = np.max(profits)
-        min_dd = np.min(drawdowns)
-        max_dd = np.max(drawdowns)
+        avg_profit = avg_profits[i - 1]
+        avg_drawdown = avg_drawdowns[i - 1]
+        min_profit = min_profits[i - 1]
+        max_profit = max_profits[i - 1]
+        min_dd = min_dds[i - 1]
+        max_dd = max_dds[i - 1]
         avg_per_trade = avg_profit / num_trades
         ratio = avg_profit / abs(avg_drawdown) if avg_drawdown != 0 else float('inf')
         ratio_max_dd = avg_profit / abs(max_dd) if max_dd != 0 else float('inf')
@@ -529,7 +594,7 @@ def run_all_strategies(
 
     return summary_final
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description="Simulate 20 trading strategies with/without Markov correlations, second-order Markov, and regime switching")
     parser.add_argument("--hit_rate", type=float, required=True, help="Hit rate, e.g. 0.7")
     parser.add_argument("--avg_win", type=float, required=True, help="Average win per trade")
@@ -547,57 +612,85 @@ def main():
     parser.add_argument("--p_win_ll", type=float, default=0.3, help="P(win|loss,loss) for 2nd order Markov")
     parser.add_argument("--use_regime", action="store_true", help="Use regime switching model")
     parser.add_argument("--regimes", type=str, default=None, help="Regime list as JSON string")
-    args = parser.parse_args()
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the simulations; 0 uses all available CPUs (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible results (default: fresh entropy)")
+    return parser
+
+def run(config):
+    """
+    Runs one simulation setting and returns the console report as a string.
+    `config` holds the same keys as the command line options, with `regimes`
+    already decoded to a list (or None).
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        print_report(config)
+    return output.getvalue()
+
+def model_label(config):
+    """Returns the report heading for the hit rate and trade model in config."""
+    if config["use_regime"]:
+        model = "Regime Switching Model"
+    elif config["use_markov2"]:
+        model = "2nd Order Markov"
+    elif config["use_markov"]:
+        model = "1st Order Markov"
+    else:
+        model = "No Markov"
+    return f"Hit rate: {int(round(config['hit_rate'] * 100))}%  -  {model}"
 
+def print_report(config):
     print("\n" + "="*90)
     print("CURRENT SIMULATION SETTING:")
-    print(f"Hit rate: {args.hit_rate:.2%}")
-    if args.use_regime:
+    print(f"Hit rate: {config['hit_rate']:.2%}")
+    if config["use_regime"]:
         print("Mode: Regime Switching")
-        if args.regimes:
-            print(f"Regimes: {args.regimes}")
-    elif args.use_markov2:
+        if config["regimes"]:
+            print(f"Regimes: {pyjson.dumps(config['regimes'])}")
+    elif config["use_markov2"]:
         print("Mode: 2nd Order Markov")
-        print(f"P(win|WW): {args.p_win_ww}, P(win|WL): {args.p_win_wl}, P(win|LW): {args.p_win_lw}, P(win|LL): {args.p_win_ll}")
-    elif args.use_markov:
+        print(f"P(win|WW): {config['p_win_ww']}, P(win|WL): {config['p_win_wl']}, P(win|LW): {config['p_win_lw']}, P(win|LL): {config['p_win_ll']}")
+    elif config["use_markov"]:
         print("Mode: 1st Order Markov")
-        print(f"P(win|win): {args.p_win_after_win}, P(win|loss): {args.p_win_after_loss}")
+        print(f"P(win|win): {config['p_win_after_win']}, P(win|loss): {config['p_win_after_loss']}")
     else:
         print("Mode: No Markov")
     print("="*90 + "\n")
 
-    print(f"Average win per trade: €{args.avg_win}")
-    print(f"Average loss per trade: €{args.avg_loss}")
-    print(f"Number of simulations: {args.num_simulations}")
-    print(f"Number of trades per simulation: {args.num_trades}")
-    print(f"Number of shuffles per simulation: {args.num_mc_shuffles}")
+    print(f"Average win per trade: €{config['avg_win']}")
+    print(f"Average loss per trade: €{config['avg_loss']}")
+    print(f"Number of simulations: {config['num_simulations']}")
+    print(f"Number of trades per simulation: {config['num_trades']}")
+    print(f"Number of shuffles per simulation: {config['num_mc_shuffles']}")
 
     mode = "No Markov"
-    if args.use_regime:
+    if config["use_regime"]:
         mode = "Regime Switching"
-    elif args.use_markov2:
+    elif config["use_markov2"]:
         mode = "2nd Order Markov"
-    elif args.use_markov:
+    elif config["use_markov"]:
         mode = "1st Order Markov"
 
-    breakeven = find_break_even_hit_rate(args.avg_win, args.avg_loss, mode)
+    breakeven = find_break_even_hit_rate(config["avg_win"], config["avg_loss"], mode)
     print(f"Break-even hit rate: {breakeven:.2%}")
 
-    regimes = pyjson.loads(args.regimes) if args.use_regime and args.regimes else None
+    regimes = config["regimes"] if config["use_regime"] else None
 
     summary = run_all_strategies(
-        args.hit_rate, args.avg_win, args.avg_loss, args.num_trades,
-        args.num_simulations, args.num_mc_shuffles,
-        use_markov=args.use_markov,
-        p_win_after_win=args.p_win_after_win,
-        p_win_after_loss=args.p_win_after_loss,
-        use_markov2=args.use_markov2,
-        p_win_ww=args.p_win_ww,
-        p_win_wl=args.p_win_wl,
-        p_win_lw=args.p_win_lw,
-        p_win_ll=args.p_win_ll,
-        use_regime=args.use_regime,
-        regimes=regimes
+        config["hit_rate"], config["avg_win"], config["avg_loss"], config["num_trades"],
+        config["num_simulations"], config["num_mc_shuffles"],
+        use_markov=config["use_markov"],
+        p_win_after_win=config["p_win_after_win"],
+        p_win_after_loss=config["p_win_after_loss"],
+        use_markov2=config["use_markov2"],
+        p_win_ww=config["p_win_ww"],
+        p_win_wl=config["p_win_wl"],
+        p_win_lw=config["p_win_lw"],
+        p_win_ll=config["p_win_ll"],
+        use_regime=config["use_regime"],
+        regimes=regimes,
+        workers=config["workers"],
+        rng=np.random.default_rng(config["seed"])
     )
 
     print("\nResults (Monte Carlo, based on input parameters):\n")
@@ -611,27 +704,8 @@ def main():
 
     print()
 
-    try:
-        from colorama import Fore, Style
-        if args.use_regime:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  Regime Switching Model"
-        elif args.use_markov2:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  2nd Order Markov"
-        elif args.use_markov:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  1st Order Markov"
-        else:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  No Markov"
-        print(Fore.YELLOW + f"*** {model_label} ***" + Style.RESET_ALL)
-    except ImportError:
-        if args.use_regime:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  Regime Switching Model"
-        elif args.use_markov2:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  2nd Order Markov"
-        elif args.use_markov:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  1st Order Markov"
-        else:
-            model_label = f"Hit rate: {int(round(args.hit_rate * 100))}%  -  No Markov"
-        print(f"*** {model_label} ***")
+    label = f"*** {model_label(config)} ***"
+    print(Fore.YELLOW + label + Style.RESET_ALL if HAVE_COLORAMA else label)
 
     print()
 
@@ -644,9 +718,8 @@ def main():
         if idx == 2:
             print("-" * len(header))
 
-    try:
-        from colorama import Fore, Style, init
-        init(autoreset=True)
+    if HAVE_COLORAMA:
+        colorama_init(autoreset=True)
         konst_idx = next((i for i, row in enumerate(summary) if row[0].startswith("Constant position size 1")), None)
         print("\n\n\nTop 4 strategies compared to 'Constant position size 1':")
         print("--------------------------------------------------------------")
@@ -667,8 +740,12 @@ def main():
                     f"{konst_row[4]:12.2f} {konst_row[5]:12.2f} {konst_row[6]:14.2f} {konst_row[7]:14.2f} "
                     f"{konst_row[8]:12.2f} {konst_row[9]:18.2f}"
                 ) + Style.RESET_ALL)
-    except ImportError:
-        pass
+
+def main():
+    config = vars(build_parser().parse_args())
+    config["regimes"] = pyjson.loads(config["regimes"]) if config["use_regime"] and config["regimes"] else None
+    # Print directly instead of going through run(), so the report streams as it is produced
+    print_report(config)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+MODULE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "src", "trading_models.py")
+
+
+def load_without_numba():
+    """ Imports src/trading_models.py as if Numba were not installed. """
+    spec = importlib.util.spec_from_file_location("trading_models_no_numba", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(sys.modules, {"numba": None}):
+        spec.loader.exec_module(module)
+    return module
+
+
+class FallbackPrecisionTest(unittest.TestCase):
+    """ The NumPy fallback must accumulate float32 trades in float64, like the Numba kernels. """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tm = load_without_numba()
+        rng = np.random.default_rng(42)
+        cls.paths = np.stack([
+            cls.tm.simulate_trades_dynamic(1000, 0.55, 123.45, 101.37, rng) for _ in range(3)
+        ])
+
+    def test_fallback_is_active(self):
+        self.assertFalse(self.tm.HAVE_NUMBA)
+        self.assertEqual(self.paths.dtype, np.float32)
+
+    def test_strategies_match_float64_input(self):
+        profits, drawdowns = self.tm.run_all_on_paths(self.paths)
+        ref_profits, ref_drawdowns = self.tm.run_all_on_paths(self.paths.astype(np.float64))
+        np.testing.assert_array_equal(profits, ref_profits)
+        np.testing.assert_array_equal(drawdowns, ref_drawdowns)
+
+    def test_constant_kernel_matches_vectorized(self):
+        generic = self.tm.make_kind_kernel(self.tm.KIND_CONSTANT)
+        for path in self.paths:
+            profit, drawdown = generic(path, 0, 1, 1)
+            ref_profit, ref_drawdown = self.tm.run_constant(path)
+            self.assertEqual(profit, ref_profit)
+            self.assertEqual(drawdown, ref_drawdown)
+
+
+if __name__ == "__main__":
+    unittest.main()